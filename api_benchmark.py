@@ -1,17 +1,35 @@
 import asyncio
-import httpx
+from itertools import chain
+from operator import itemgetter
+import aiohttp
+import orjson
 import time
 import logging
+import logging.handlers
+import queue
 from datetime import datetime
 
+try:
+    import uvloop
+except ImportError:  # Not available on Windows
+    uvloop = None
+
 ENDPOINTS = {
     "fastapi": "http://localhost:8000/items/",
     "flask": "http://localhost:5000/items/",
     "drf": "http://localhost:8001/items/",
 }
 
+# How to pull the new item's id out of each framework's POST response
+ID_EXTRACTORS = {
+    "fastapi": itemgetter("id"),
+    "flask": itemgetter("id"),
+    "drf": itemgetter("id"),
+}
+
 NUM_REQUESTS = 500
 CONCURRENCY = 20
+BULK_SIZE = 0  # Items per bulk POST/DELETE call, 0 sends one request per item
 
 item_payload = {
     "name": "Test Item",
@@ -20,25 +38,38 @@ item_payload = {
     "in_stock": True
 }
 
+# Request bodies are encoded once up front instead of on every request
+POST_BODY = orjson.dumps(item_payload)
+PUT_BODY = orjson.dumps({"name": "Updated", **item_payload})
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 # Setup logging
 def setup_logging():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_filename = f"api_benchmark_{timestamp}.log"
     
-    # Disable httpx logging
-    logging.getLogger("httpx").setLevel(logging.WARNING)
-    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    # Disable aiohttp logging
+    logging.getLogger("aiohttp").setLevel(logging.WARNING)
     
     # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_filename, mode='w'),
-            logging.StreamHandler()  # Also print to console
-        ]
-    )
-    return log_filename
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [
+        logging.FileHandler(log_filename, mode='w'),
+        logging.StreamHandler()  # Also print to console
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # The QueueHandler still merges each record's message on the event loop,
+    # but the timestamp/level formatting and the file/console IO happen on
+    # the listener's background thread
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    return log_filename, listener
 
 def print_metrics(name, duration, success, failures, total_requests):
     rps = success / duration if duration > 0 else 0
@@ -49,155 +80,182 @@ def print_metrics(name, duration, success, failures, total_requests):
     logging.info(f"  RPS: {rps:.2f}")
     logging.info("")
 
-async def post_item(client, url):
+async def post_item(session, url, extract_id):
     try:
-        r = await client.post(url, json=item_payload)
-        
-        if r.status_code in (200, 201):
-            response_data = r.json()
-            item_id = response_data.get("id")
-            if item_id is None:
-                # Try to find id in different possible formats
-                if isinstance(response_data, dict):
-                    for key, value in response_data.items():
-                        if key.lower() == 'id' or (isinstance(value, int) and value > 0):
-                            item_id = value
-                            break
-            return item_id
-        else:
-            logging.error(f"POST {url} - Failed with status {r.status_code}: {r.text}")
+        async with session.post(url, data=POST_BODY, headers=JSON_HEADERS) as r:
+            if r.status in (200, 201):
+                return extract_id(await r.json())
+            else:
+                logging.error("POST %s - Failed with status %d: %s", url, r.status, await r.text())
     except Exception as e:
-        logging.error(f"POST {url} - Exception: {e}")
+        logging.error("POST %s - Exception: %s", url, e)
     return None
 
-async def get_item(client, url, item_id):
+async def get_item(session, item_url):
     try:
-        # Handle DRF trailing slash requirement
-        if 'drf' in url or '8001' in url:
-            get_url = f"{url}{item_id}/"
-        else:
-            get_url = f"{url}{item_id}"
-        r = await client.get(get_url)
-        if r.status_code == 200:
-            return True
-        else:
-            logging.error(f"GET {get_url} - Failed: {r.text}")
-            return False
+        async with session.get(item_url) as r:
+            if r.status == 200:
+                return True
+            else:
+                logging.error("GET %s - Failed: %s", item_url, await r.text())
+                return False
     except Exception as e:
-        logging.error(f"GET {url}{item_id} - Exception: {e}")
+        logging.error("GET %s - Exception: %s", item_url, e)
         return False
 
-async def put_item(client, url, item_id):
+async def put_item(session, item_url):
     try:
-        # Handle DRF trailing slash requirement
-        if 'drf' in url or '8001' in url:
-            put_url = f"{url}{item_id}/"
-        else:
-            put_url = f"{url}{item_id}"
-        put_payload = {"name": "Updated", **item_payload}
-        r = await client.put(put_url, json=put_payload)
-        if r.status_code == 200:
-            return True
-        else:
-            logging.error(f"PUT {put_url} - Failed: {r.text}")
-            return False
+        async with session.put(item_url, data=PUT_BODY, headers=JSON_HEADERS) as r:
+            if r.status == 200:
+                return True
+            else:
+                logging.error("PUT %s - Failed: %s", item_url, await r.text())
+                return False
     except Exception as e:
-        logging.error(f"PUT {url}{item_id} - Exception: {e}")
+        logging.error("PUT %s - Exception: %s", item_url, e)
         return False
 
-async def delete_item(client, url, item_id):
+async def delete_item(session, item_url):
     try:
-        # Handle DRF trailing slash requirement
-        if 'drf' in url or '8001' in url:
-            delete_url = f"{url}{item_id}/"
-        else:
-            delete_url = f"{url}{item_id}"
-        r = await client.delete(delete_url)
-        if r.status_code in (200, 204):
-            return True
-        else:
-            logging.error(f"DELETE {delete_url} - Failed: {r.text}")
-            return False
+        async with session.delete(item_url) as r:
+            if r.status in (200, 204):
+                return True
+            else:
+                logging.error("DELETE %s - Failed: %s", item_url, await r.text())
+                return False
     except Exception as e:
-        logging.error(f"DELETE {url}{item_id} - Exception: {e}")
+        logging.error("DELETE %s - Exception: %s", item_url, e)
         return False
 
-async def benchmark_crud(name, url):
+async def bulk_post_items(session, bulk_url, count):
+    try:
+        async with session.post(bulk_url, data=orjson.dumps([item_payload] * count), headers=JSON_HEADERS) as r:
+            if r.status in (200, 201):
+                return await r.json()
+            else:
+                logging.error("POST %s - Failed with status %d: %s", bulk_url, r.status, await r.text())
+    except Exception as e:
+        logging.error("POST %s - Exception: %s", bulk_url, e)
+    return []
+
+async def bulk_delete_items(session, bulk_url, item_ids):
+    try:
+        async with session.delete(bulk_url, json=item_ids) as r:
+            if r.status in (200, 204):
+                return (await r.json())["deleted"]
+            else:
+                logging.error("DELETE %s - Failed: %s", bulk_url, await r.text())
+    except Exception as e:
+        logging.error("DELETE %s - Exception: %s", bulk_url, e)
+    return 0
+
+async def limited(sem, coro):
+    # Cap the number of in-flight requests at CONCURRENCY
+    async with sem:
+        return await coro
+
+async def read_update_cycle(session, item_url):
+    # GET then PUT the same item while its connection is still warm
+    return await get_item(session, item_url) + await put_item(session, item_url)
+
+async def crud_cycle(session, url, suffix, extract_id):
+    # Run POST -> GET -> PUT -> DELETE for one item back to back
+    item_id = await post_item(session, url, extract_id)
+    if item_id is None:
+        return 0
+    item_url = f"{url}{item_id}{suffix}"
+    return 1 + await read_update_cycle(session, item_url) + await delete_item(session, item_url)
+
+async def benchmark_crud(name, url, session):
     success = 0
     failures = 0
-    item_ids = []
+
+    # Handle DRF trailing slash requirement once per framework
+    suffix = "/" if ("drf" in url or "8001" in url) else ""
+    bulk_url = f"{url}bulk{suffix}"
+    extract_id = ID_EXTRACTORS[name]
+    sem = asyncio.Semaphore(CONCURRENCY)
 
     logging.info(f"Starting benchmark for {name.upper()}...")
-    
-    # Use connection pooling and limits to prevent overwhelming the database
-    limits = httpx.Limits(max_keepalive_connections=20, max_connections=50)
-    timeout = httpx.Timeout(30.0, connect=10.0)
-    
-    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
-        start = time.perf_counter()
 
-        # POST - Create items in batches to reduce connection pressure
+    start = time.perf_counter()
+
+    if BULK_SIZE:
+        # POST - Create items in bulk batches
         logging.info(f"{name.upper()} - Creating {NUM_REQUESTS} items...")
-        post_tasks = [post_item(client, url) for _ in range(NUM_REQUESTS)]
-        post_results = await asyncio.gather(*post_tasks, return_exceptions=True)
-        item_ids.extend([id for id in post_results if id and not isinstance(id, Exception)])
+        batches = [min(BULK_SIZE, NUM_REQUESTS - i) for i in range(0, NUM_REQUESTS, BULK_SIZE)]
+        post_tasks = [limited(sem, bulk_post_items(session, bulk_url, count)) for count in batches]
+        post_results = await asyncio.gather(*post_tasks)
+        # Every request coroutine catches its own errors, so results are never exceptions
+        item_ids = list(chain.from_iterable(post_results))
         logging.info(f"{name.upper()} - Created {len(item_ids)} items")
 
-        # Small delay to allow database to stabilize
-        await asyncio.sleep(1)
-
-        # GET - Read items
-        logging.info(f"{name.upper()} - Reading {len(item_ids)} items...")
-        get_tasks = [get_item(client, url, id) for id in item_ids]
-        get_results = await asyncio.gather(*get_tasks, return_exceptions=True)
+        # GET + PUT - Read and update each item
+        logging.info(f"{name.upper()} - Reading and updating {len(item_ids)} items...")
+        rw_tasks = [limited(sem, read_update_cycle(session, f"{url}{id}{suffix}")) for id in item_ids]
+        rw_results = await asyncio.gather(*rw_tasks)
 
-        # Small delay to allow database to stabilize
-        await asyncio.sleep(1)
-
-        # PUT - Update items
-        logging.info(f"{name.upper()} - Updating {len(item_ids)} items...")
-        put_tasks = [put_item(client, url, id) for id in item_ids]
-        put_results = await asyncio.gather(*put_tasks, return_exceptions=True)
-
-        # Small delay to allow database to stabilize
-        await asyncio.sleep(1)
-
-        # DELETE - Delete items
+        # DELETE - Delete items in bulk batches
         logging.info(f"{name.upper()} - Deleting {len(item_ids)} items...")
-        delete_tasks = [delete_item(client, url, id) for id in item_ids]
-        delete_results = await asyncio.gather(*delete_tasks, return_exceptions=True)
+        delete_tasks = [
+            limited(sem, bulk_delete_items(session, bulk_url, item_ids[i:i + BULK_SIZE]))
+            for i in range(0, len(item_ids), BULK_SIZE)
+        ]
+        delete_results = await asyncio.gather(*delete_tasks)
 
-        duration = time.perf_counter() - start
+        results = [len(item_ids), *rw_results, *delete_results]
+    else:
+        # POST -> GET -> PUT -> DELETE per item, CONCURRENCY items at a time
+        logging.info(f"{name.upper()} - Running {NUM_REQUESTS} CRUD cycles...")
+        cycle_tasks = [limited(sem, crud_cycle(session, url, suffix, extract_id)) for _ in range(NUM_REQUESTS)]
+        results = await asyncio.gather(*cycle_tasks)
 
-        total_requests = NUM_REQUESTS * 4  # POST + GET + PUT + DELETE
-        success = sum([
-            len([r for r in post_results if r and not isinstance(r, Exception)]),
-            sum([r for r in get_results if r and not isinstance(r, Exception)]),
-            sum([r for r in put_results if r and not isinstance(r, Exception)]),
-            sum([r for r in delete_results if r and not isinstance(r, Exception)])
-        ])
-        failures = total_requests - success
+    duration = time.perf_counter() - start
 
-        logging.info(f"{name.upper()} - Benchmark completed")
-        print_metrics(name, duration, success, failures, total_requests)
+    total_requests = NUM_REQUESTS * 4  # POST + GET + PUT + DELETE
+    success = sum(results)
+    failures = total_requests - success
 
+    logging.info(f"{name.upper()} - Benchmark completed")
+    print_metrics(name, duration, success, failures, total_requests)
 
 async def main():
     # Setup logging
-    log_filename = setup_logging()
-    logging.info(f"Logging to: {log_filename}")
+    log_filename, listener = setup_logging()
+    try:
+        logging.info(f"Logging to: {log_filename}")
     
-    logging.info("Starting API Benchmark...")
-    logging.info("=" * 50)
+        logging.info("Starting API Benchmark...")
+        logging.info("=" * 50)
     
-    for name, url in ENDPOINTS.items():
-        logging.info(f"Testing {name.upper()} at {url}")
-        await benchmark_crud(name, url)
-        # Add delay between frameworks to allow database recovery
-        await asyncio.sleep(2)
+        # Use connection pooling and limits to prevent overwhelming the database.
+        # A single session is shared by all frameworks so the connector and its
+        # DNS cache stay warm across runs, and HTTP/1.1 keep-alive is kept on so
+        # connections are reused instead of re-opened per request.
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=50,
+            keepalive_timeout=60,
+            force_close=False,
+        )
+        timeout = aiohttp.ClientTimeout(total=30, connect=10)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            for name, url in ENDPOINTS.items():
+                logging.info(f"Testing {name.upper()} at {url}")
+                await benchmark_crud(name, url, session)
+                # Add delay between frameworks to allow database recovery
+                await asyncio.sleep(2)
     
-    logging.info("Benchmark completed!")
-    logging.info(f"Full log saved to: {log_filename}")
+        logging.info("Benchmark completed!")
+        logging.info(f"Full log saved to: {log_filename}")
+    finally:
+        # Flush queued log records even if the benchmark fails
+        listener.stop()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    if uvloop is None:
+        asyncio.run(main())
+    else:
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(main())
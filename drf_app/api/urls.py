@@ -4,5 +4,6 @@ from .views import ItemViewSet
 # Create explicit URL patterns to avoid router issues
 urlpatterns = [
     path('items/', ItemViewSet.as_view({'get': 'list', 'post': 'create'}), name='item-list'),
+    path('items/bulk/', ItemViewSet.as_view({'post': 'bulk_create', 'delete': 'bulk_destroy'}), name='item-bulk'),
     path('items/<int:pk>/', ItemViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='item-detail'),
 ]
\ No newline at end of file
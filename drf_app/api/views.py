@@ -7,6 +7,14 @@ class ItemViewSet(viewsets.ModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
     
+    def list(self, request, *args, **kwargs):
+        # Read plain dicts instead of running the serializer on every row
+        queryset = self.filter_queryset(self.get_queryset()).values('id', 'name', 'description', 'price', 'in_stock')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(queryset))
+
     def update(self, request, *args, **kwargs):
         try:
             return super().update(request, *args, **kwargs)
@@ -14,4 +22,16 @@ class ItemViewSet(viewsets.ModelViewSet):
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+    def bulk_create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        items = Item.objects.bulk_create(
+            [Item(**data) for data in serializer.validated_data]
+        )
+        return Response([item.id for item in items], status=status.HTTP_201_CREATED)
+
+    def bulk_destroy(self, request, *args, **kwargs):
+        deleted, _ = Item.objects.filter(id__in=request.data).delete()
+        return Response({'deleted': deleted})
\ No newline at end of file
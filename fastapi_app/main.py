@@ -1,19 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import insert, select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 import models, database
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from typing import List
+import orjson
+from cachetools import TTLCache
 
-models.Base.metadata.create_all(bind=database.engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with database.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield
+    await database.engine.dispose()
 
-app = FastAPI()
+class ORJSONRequest(Request):
+    # Parse request bodies with orjson instead of the stdlib json module
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = orjson.loads(await self.body())
+        return self._json
 
-def get_db():
-    db = database.SessionLocal()
-    try:
+class ORJSONRoute(APIRoute):
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            return await original_route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return route_handler
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.router.route_class = ORJSONRoute
+
+async def get_db():
+    async with database.SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 class ItemSchema(BaseModel):
     id: int = None
@@ -22,54 +47,94 @@ class ItemSchema(BaseModel):
     price: float
     in_stock: bool
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+item_list_adapter = TypeAdapter(List[ItemSchema])
+
+# Serialized list_items body, reused for up to a second and dropped on writes
+list_cache = TTLCache(maxsize=1, ttl=1.0)
+# Bumped on every write, so a list read that overlapped a write doesn't put
+# its stale body back into the cache
+list_generation = 0
+
+def invalidate_list_cache():
+    global list_generation
+    list_generation += 1
+    list_cache.clear()
 
 @app.post("/items/", response_model=ItemSchema)
-def create_item(item: ItemSchema, db: Session = Depends(get_db)):
+async def create_item(item: ItemSchema, db: AsyncSession = Depends(get_db)):
     try:
         # Exclude id from the data since it's auto-generated
-        item_data = item.dict(exclude={'id'})
-        db_item = models.Item(**item_data)
-        db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
+        item_data = item.model_dump(exclude={'id'})
+        # INSERT ... RETURNING hands back the new row without a refresh SELECT
+        stmt = insert(models.Item).values(**item_data).returning(models.Item)
+        db_item = (await db.execute(stmt)).scalar_one()
+        await db.commit()
+        invalidate_list_cache()
         return db_item
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @app.get("/items/", response_model=List[ItemSchema])
-def list_items(db: Session = Depends(get_db)):
-    return db.query(models.Item).all()
+async def list_items(db: AsyncSession = Depends(get_db)):
+    body = list_cache.get("items")
+    if body is None:
+        generation = list_generation
+        items = (await db.scalars(select(models.Item))).all()
+        body = item_list_adapter.dump_json(items)
+        if generation == list_generation:
+            list_cache["items"] = body
+    return Response(content=body, media_type="application/json")
+
+@app.post("/items/bulk", response_model=List[int])
+async def bulk_create_items(items: List[ItemSchema], db: AsyncSession = Depends(get_db)):
+    try:
+        # Single multi-row INSERT ... RETURNING id instead of one round trip per item
+        stmt = insert(models.Item).returning(models.Item.id)
+        ids = (await db.scalars(stmt, [item.model_dump(exclude={'id'}) for item in items])).all()
+        await db.commit()
+        invalidate_list_cache()
+        return ids
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.delete("/items/bulk")
+async def bulk_delete_items(ids: List[int], db: AsyncSession = Depends(get_db)):
+    stmt = delete(models.Item).where(models.Item.id.in_(ids)).execution_options(synchronize_session=False)
+    deleted = (await db.execute(stmt)).rowcount
+    await db.commit()
+    invalidate_list_cache()
+    return {"deleted": deleted}
 
 @app.get("/items/{item_id}", response_model=ItemSchema)
-def get_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(models.Item).get(item_id)
+async def get_item(item_id: int, db: AsyncSession = Depends(get_db)):
+    item = await db.get(models.Item, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     return item
 
 @app.put("/items/{item_id}", response_model=ItemSchema)
-def update_item(item_id: int, item: ItemSchema, db: Session = Depends(get_db)):
-    db_item = db.query(models.Item).get(item_id)
+async def update_item(item_id: int, item: ItemSchema, db: AsyncSession = Depends(get_db)):
+    # Update only the fields that should be updated (exclude id), and get the
+    # row back from UPDATE ... RETURNING instead of a SELECT before and after
+    update_data = item.model_dump(exclude={'id'})
+    stmt = update(models.Item).where(models.Item.id == item_id).values(**update_data).returning(models.Item)
+    db_item = (await db.execute(stmt)).scalar_one_or_none()
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    # Update only the fields that should be updated (exclude id)
-    update_data = item.dict(exclude={'id'})
-    for key, value in update_data.items():
-        setattr(db_item, key, value)
-    
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    invalidate_list_cache()
     return db_item
 
 @app.delete("/items/{item_id}")
-def delete_item(item_id: int, db: Session = Depends(get_db)):
-    db_item = db.query(models.Item).get(item_id)
-    if not db_item:
+async def delete_item(item_id: int, db: AsyncSession = Depends(get_db)):
+    stmt = delete(models.Item).where(models.Item.id == item_id).returning(models.Item.id)
+    if (await db.execute(stmt)).scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Item not found")
-    db.delete(db_item)
-    db.commit()
+    await db.commit()
+    invalidate_list_cache()
     return {"ok": True}
\ No newline at end of file
@@ -1,8 +1,22 @@
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
+from flask.json.provider import DefaultJSONProvider
+from cachetools import TTLCache
+import orjson
+from sqlalchemy import insert
 from models import Item
 from database import db, DATABASE_URL, engine
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes and decodes with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
@@ -18,18 +32,41 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Serialized list_items body, reused for up to a second and dropped on writes
+list_cache = TTLCache(maxsize=1, ttl=1.0)
+
 @app.route("/items/", methods=["POST"])
 def create_item():
     data = request.get_json()
-    item = Item(**data)
-    db.session.add(item)
+    # INSERT ... RETURNING id avoids reloading the expired instance after commit
+    item_id = db.session.scalar(insert(Item).values(**data).returning(Item.id))
     db.session.commit()
-    return jsonify({"id": item.id, **data})
+    list_cache.clear()
+    return jsonify({"id": item_id, **data})
 
 @app.route("/items/", methods=["GET"])
 def list_items():
-    items = Item.query.all()
-    return jsonify([{ "id": i.id, "name": i.name, "description": i.description, "price": i.price, "in_stock": i.in_stock } for i in items])
+    body = list_cache.get("items")
+    if body is None:
+        items = Item.query.all()
+        body = list_cache["items"] = orjson.dumps([{ "id": i.id, "name": i.name, "description": i.description, "price": i.price, "in_stock": i.in_stock } for i in items])
+    return Response(body, mimetype="application/json")
+
+@app.route("/items/bulk", methods=["POST"])
+def bulk_create_items():
+    data = request.get_json()
+    ids = db.session.scalars(insert(Item).returning(Item.id), data).all()
+    db.session.commit()
+    list_cache.clear()
+    return jsonify(ids)
+
+@app.route("/items/bulk", methods=["DELETE"])
+def bulk_delete_items():
+    ids = request.get_json()
+    deleted = Item.query.filter(Item.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    list_cache.clear()
+    return jsonify({"deleted": deleted})
 
 @app.route("/items/<int:item_id>", methods=["GET"])
 def get_item(item_id):
@@ -47,6 +84,7 @@ def update_item(item_id):
     for key, value in data.items():
         setattr(item, key, value)
     db.session.commit()
+    list_cache.clear()
     return jsonify({ "id": item.id, **data })
 
 @app.route("/items/<int:item_id>", methods=["DELETE"])
@@ -56,4 +94,5 @@ def delete_item(item_id):
         abort(404)
     db.session.delete(item)
     db.session.commit()
+    list_cache.clear()
     return jsonify({"ok": True})
@@ -1,17 +1,39 @@
 from locust import HttpUser, task, between
+from urllib.parse import urlparse
 import random
 import json
+import os
+import socket
+
+# Host and port to send in the Host header when URLs use pre-resolved IPs
+HOST_HEADER = os.environ.get("LOCUST_HOST_HEADER")
+
+def resolve(url):
+    """Replace the URL's hostname with its IP, so DNS is looked up once per process"""
+    parsed = urlparse(url)
+    ip = socket.gethostbyname(parsed.hostname)
+    return f"{parsed.scheme}://{ip}:{parsed.port}"
+
+FASTAPI_URL = resolve("http://localhost:8000")
+FLASK_URL = resolve("http://localhost:5000")
+DRF_URL = resolve("http://localhost:8001")
 
 class APIUser(HttpUser):
+    abstract = True  # Only the per-API subclasses below are run
     wait_time = between(1, 3)  # Wait 1-3 seconds between requests
     
+    def __init__(self, environment):
+        super().__init__(environment)
+        if HOST_HEADER:
+            self.client.headers["Host"] = HOST_HEADER
+    
     def on_start(self):
         """Initialize user data"""
         self.item_ids = []
         self.base_urls = {
-            "fastapi": "http://localhost:8000",
-            "flask": "http://localhost:5000", 
-            "drf": "http://localhost:8001"
+            "fastapi": FASTAPI_URL,
+            "flask": FLASK_URL,
+            "drf": DRF_URL
         }
         self.current_api = random.choice(list(self.base_urls.keys()))
         self.base_url = self.base_urls[self.current_api]
@@ -161,7 +183,7 @@ class FastAPIUser(APIUser):
     
     def on_start(self):
         self.current_api = "fastapi"
-        self.base_url = "http://localhost:8000"
+        self.base_url = FASTAPI_URL
         self.item_ids = []
 
 
@@ -170,7 +192,7 @@ class FlaskUser(APIUser):
     
     def on_start(self):
         self.current_api = "flask"
-        self.base_url = "http://localhost:5000"
+        self.base_url = FLASK_URL
         self.item_ids = []
 
 
@@ -179,5 +201,5 @@ class DRFUser(APIUser):
     
     def on_start(self):
         self.current_api = "drf"
-        self.base_url = "http://localhost:8001"
+        self.base_url = DRF_URL
         self.item_ids = [] 
\ No newline at end of file
@@ -6,120 +6,337 @@ This script runs Locust load tests against all three APIs (FastAPI, Flask, DRF)
 with different user loads and scenarios.
 """
 
+import asyncio
+import atexit
+import csv
+import html
 import subprocess
 import time
 import os
+import glob
+import shutil
+import signal
+import socket
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import sys
 from datetime import datetime
+from urllib.parse import urlparse
 
-def run_locust_test(api_name, host, users, spawn_rate, run_time, output_file):
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared HTTP session for the pre-flight checks, so connections are pooled
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+atexit.register(SESSION.close)
+
+# Single timestamp for the whole run, so the banner and every output file agree
+RUN_TS = datetime.now()
+RUN_ISO = RUN_TS.strftime('%Y-%m-%d %H:%M:%S')
+RUN_TAG = RUN_TS.strftime('%Y%m%d_%H%M%S')
+
+# Command prefix shared by every Locust master and worker
+_LOCUST_BASE = (
+    sys.executable, "-m", "locust",
+    "--locustfile", "locustfile.py",
+    "--loglevel", "WARNING",
+)
+
+@dataclass(frozen=True, slots=True)
+class TestConfig:
+    """Load test settings for one API"""
+    name: str
+    host: str
+    user_class: str
+    users: int
+    spawn_rate: int
+    run_time: int
+
+def raise_fd_limit():
+    """Raise the open file limit to the hard limit; Locust children inherit it"""
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ValueError, OSError):
+        return soft
+    return hard
+
+def probe(config):
+    """Check whether an API accepts TCP connections, returning the error if not"""
+    # A bare connect avoids making the app serialize /items/ before the test
+    parsed = urlparse(config.host)
+    try:
+        socket.create_connection((parsed.hostname, parsed.port), timeout=2).close()
+        return config, None
+    except Exception as e:
+        return config, e
+
+def wait_ready(host, max_wait=5.0):
+    """Poll an API until it answers quickly, backing off up to max_wait seconds"""
+    deadline = time.monotonic() + max_wait
+    delay = 0.05
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            # Fetch an item that doesn't exist: any answer, even a 404, shows
+            # the app is serving, and it doesn't warm the list cache
+            SESSION.get(f"{host}/items/0", timeout=1, allow_redirects=False)
+            if time.perf_counter() - start < 0.1:
+                return True
+        except Exception:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+    return False
+
+def signal_group(proc, sig):
+    """Send a signal to a Locust process's group, or terminate the process on Windows"""
+    if hasattr(os, "killpg"):
+        os.killpg(proc.pid, sig)
+    else:  # No process groups on Windows
+        proc.terminate()
+
+async def drain_stderr(stream, log_path, tail):
+    """Copy a child's stderr to a log file line by line, keeping only the last lines in memory"""
+    with open(log_path, "w") as log:
+        async for line in stream:
+            text = line.decode(errors="replace")
+            log.write(text)
+            tail.append(text)
+
+async def run_locust_test(cfg, output_file, workers, master_port, results_dir):
     """Run a Locust test for a specific API"""
     
     print(f"\n{'='*60}")
-    print(f"Starting Locust test for {api_name.upper()}")
-    print(f"Host: {host}")
-    print(f"Users: {users}")
-    print(f"Spawn Rate: {spawn_rate} users/second")
-    print(f"Run Time: {run_time} seconds")
+    print(f"Starting Locust test for {cfg.name.upper()}")
+    print(f"Host: {cfg.host}")
+    print(f"Users: {cfg.users}")
+    print(f"Spawn Rate: {cfg.spawn_rate} users/second")
+    print(f"Run Time: {cfg.run_time} seconds")
+    print(f"Workers: {workers}")
     print(f"{'='*60}")
     
-    # Create output directory if it doesn't exist
-    os.makedirs("locust_results", exist_ok=True)
-    
-    # Run Locust command
-    cmd = [
-        "locust",
-        "--host", host,
-        "--users", str(users),
-        "--spawn-rate", str(spawn_rate),
-        "--run-time", f"{run_time}s",
+    # The locustfile resolves its URLs to IPs once per process, so it needs
+    # the original host and port to send as the Host header
+    env = {
+        **os.environ,
+        "LOCUST_HOST_HEADER": urlparse(cfg.host).netloc,
+        "PYTHONDONTWRITEBYTECODE": "1",
+        "PYTHONUNBUFFERED": "1",
+    }
+    
+    # Start as soon as the target is responsive instead of after a fixed delay
+    if not await asyncio.to_thread(wait_ready, cfg.host):
+        print(f"⚠️  {cfg.name.upper()} is still slow to respond, starting anyway")
+    
+    # Locust flushes its stats history CSV every second; write the CSVs to
+    # a memory-backed temp dir and move them into place once the run ends
+    tmp_dir = tempfile.mkdtemp(
+        prefix=f"{output_file}_",
+        dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+    
+    # Run Locust in distributed mode: the master aggregates stats and writes
+    # the reports, the workers generate the load on separate cores
+    cmd = (
+        *_LOCUST_BASE,
+        "--master",
+        "--master-bind-port", str(master_port),
+        "--expect-workers", str(workers),
+        "--host", cfg.host,
+        "--users", str(cfg.users),
+        "--spawn-rate", str(cfg.spawn_rate),
+        "--run-time", f"{cfg.run_time}s",
         "--headless",  # Run without web UI
-        "--html", f"locust_results/{output_file}.html",
-        "--csv", f"locust_results/{output_file}",
-        "--locustfile", "locustfile.py"
-    ]
+        "--csv", f"{tmp_dir}/{output_file}",
+        cfg.user_class,
+    )
+    worker_cmd = (
+        *_LOCUST_BASE,
+        "--worker",
+        "--master-port", str(master_port),
+        cfg.user_class,
+    )
     
+    proc = None
+    worker_procs = []
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=run_time + 60)
+        # Locust already writes its results to disk, so stdout is discarded and
+        # stderr is streamed to a log file instead of being buffered in memory;
+        # each worker writes its stderr straight to its own log file.
+        # Every Locust process leads its own session, so a Ctrl-C in the
+        # terminal doesn't hit the children mid-flush; the runner signals
+        # them itself.
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env,
+            start_new_session=True, close_fds=True
+        )
+        for index in range(workers):
+            with open(results_dir / f"{output_file}.worker{index}.stderr.log", "w") as worker_log:
+                worker_procs.append(await asyncio.create_subprocess_exec(
+                    *worker_cmd, stdout=subprocess.DEVNULL, stderr=worker_log, env=env,
+                    start_new_session=True, close_fds=True
+                ))
+        stderr_tail = deque(maxlen=20)
+        stderr_log = results_dir / f"{output_file}.stderr.log"
+        drain_task = asyncio.create_task(drain_stderr(proc.stderr, stderr_log, stderr_tail))
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=cfg.run_time + 10)
+        except asyncio.TimeoutError:
+            # Ask Locust to stop so it still flushes its CSVs, and only kill
+            # the whole test if it doesn't exit within a short grace period
+            signal_group(proc, signal.SIGINT)
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                for child in (proc, *worker_procs):
+                    if child.returncode is None:
+                        signal_group(child, getattr(signal, "SIGKILL", signal.SIGTERM))
+                await proc.wait()
+            await drain_task
+            print(f"⏰ {cfg.name.upper()} test timed out")
+            print(f"Logs: {stderr_log}, {results_dir / output_file}.worker*.stderr.log")
+            return
+        await drain_task
         
-        if result.returncode == 0:
-            print(f"✅ {api_name.upper()} test completed successfully")
-            print(f"📊 Results saved to: locust_results/{output_file}")
+        if proc.returncode == 0:
+            print(f"✅ {cfg.name.upper()} test completed successfully")
+            print(f"📊 Results saved to: {results_dir / output_file}")
         else:
-            print(f"❌ {api_name.upper()} test failed")
-            print(f"Error: {result.stderr}")
+            print(f"❌ {cfg.name.upper()} test failed")
+            print(f"Error: {''.join(stderr_tail)}")
+            print(f"Full log: {stderr_log}")
             
-    except subprocess.TimeoutExpired:
-        print(f"⏰ {api_name.upper()} test timed out")
     except Exception as e:
-        print(f"❌ {api_name.upper()} test error: {e}")
+        print(f"❌ {cfg.name.upper()} test error: {e}")
+    finally:
+        # The master is only still running if this run was cancelled
+        if proc is not None and proc.returncode is None:
+            signal_group(proc, signal.SIGTERM)
+            await proc.wait()
+        
+        # Workers normally exit with the master; stop any that are left over
+        for worker in worker_procs:
+            if worker.returncode is None:
+                worker.terminate()
+        await asyncio.gather(*(worker.wait() for worker in worker_procs))
+        
+        for path in glob.glob(f"{tmp_dir}/*"):
+            shutil.move(path, results_dir)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def render_table(csv_path):
+    """Render a Locust CSV as an HTML table"""
+    
+    with open(csv_path, newline="") as f:
+        rows = list(csv.reader(f))
+    
+    header, body = rows[0], rows[1:]
+    table = ["<tr>" + "".join(f"<th>{html.escape(cell)}</th>" for cell in header) + "</tr>"]
+    table += ["<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>" for row in body]
+    return "<table border=\"1\" cellpadding=\"4\">\n" + "\n".join(table) + "\n</table>\n"
+
+def render_html(output_file, results_dir):
+    """Render an HTML summary of a finished test from its stats, failures and exceptions CSVs"""
+    
+    stats_csv = results_dir / f"{output_file}_stats.csv"
+    if not stats_csv.exists():
+        return None
+    
+    sections = []
+    for title, suffix in (("Statistics", "stats"), ("Failures", "failures"), ("Exceptions", "exceptions")):
+        csv_path = results_dir / f"{output_file}_{suffix}.csv"
+        if csv_path.exists():
+            sections.append(f"<h2>{title}</h2>\n" + render_table(csv_path))
+    
+    report = results_dir / f"{output_file}.html"
+    with open(report, "w") as f:
+        f.write(
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(output_file)}</title></head><body>\n"
+            f"<h1>{html.escape(output_file)}</h1>\n" + "".join(sections) +
+            "</body></html>\n"
+        )
+    return report
+
+async def run_all_tests(test_configs, timestamp, results_dir):
+    """Run the Locust tests for all APIs concurrently"""
+    
+    # Each API has its own host and database, and each test only runs that
+    # API's user class, so the tests don't interfere.
+    # The CPU cores are split between the concurrent tests' workers, and each
+    # master listens on its own port.
+    workers = max(1, (os.cpu_count() or 1) // len(test_configs))
+    await asyncio.gather(*[
+        run_locust_test(
+            config,
+            f"{config.name.lower()}_load_test_{timestamp}",
+            workers,
+            5557 + 10 * index,
+            results_dir
+        )
+        for index, config in enumerate(test_configs)
+    ])
 
 def main():
     """Main function to run all Locust tests"""
     
     print("🚀 Starting Locust Load Testing Suite")
-    print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"📅 {RUN_ISO}")
+    
+    # Create output directory if it doesn't exist
+    results_dir = Path("locust_results")
+    results_dir.mkdir(exist_ok=True)
+    
+    # Every concurrent user holds sockets open, so lift the default fd limit
+    # to keep connection errors from silently skewing the results
+    fd_limit = raise_fd_limit()
+    if fd_limit is not None:
+        print(f"📂 Open file limit: {fd_limit}")
     
     # Test configurations
     test_configs = [
-        {
-            "name": "FastAPI",
-            "host": "http://localhost:8000",
-            "users": 50,
-            "spawn_rate": 5,
-            "run_time": 60
-        },
-        {
-            "name": "Flask", 
-            "host": "http://localhost:5000",
-            "users": 50,
-            "spawn_rate": 5,
-            "run_time": 60
-        },
-        {
-            "name": "DRF",
-            "host": "http://localhost:8001", 
-            "users": 50,
-            "spawn_rate": 5,
-            "run_time": 60
-        }
+        TestConfig(name="FastAPI", host="http://localhost:8000", user_class="FastAPIUser", users=50, spawn_rate=5, run_time=60),
+        TestConfig(name="Flask", host="http://localhost:5000", user_class="FlaskUser", users=50, spawn_rate=5, run_time=60),
+        TestConfig(name="DRF", host="http://localhost:8001", user_class="DRFUser", users=50, spawn_rate=5, run_time=60),
     ]
     
     # Check if applications are running
     print("\n🔍 Checking if applications are running...")
-    for config in test_configs:
-        try:
-            import requests
-            response = requests.get(f"{config['host']}/items/", timeout=5)
-            if response.status_code == 200:
-                print(f"✅ {config['name']} is running at {config['host']}")
-            else:
-                print(f"⚠️  {config['name']} responded with status {response.status_code}")
-        except Exception as e:
-            print(f"❌ {config['name']} is not accessible: {e}")
+    with ThreadPoolExecutor(max_workers=len(test_configs)) as executor:
+        results = list(executor.map(probe, test_configs))
+    
+    for config, error in results:
+        if error is not None:
+            print(f"❌ {config.name} is not accessible: {error}")
             print("Please start the applications with: docker-compose up -d")
             sys.exit(1)
+        print(f"✅ {config.name} is running at {config.host}")
     
     # Run tests
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = RUN_TAG
+    
+    asyncio.run(run_all_tests(test_configs, timestamp, results_dir))
     
+    # HTML reports are rendered from the CSVs once all load has finished, so
+    # Locust doesn't spend time building them at the end of each run
     for config in test_configs:
-        output_file = f"{config['name'].lower()}_load_test_{timestamp}"
-        run_locust_test(
-            config["name"],
-            config["host"], 
-            config["users"],
-            config["spawn_rate"],
-            config["run_time"],
-            output_file
-        )
-        
-        # Wait between tests
-        time.sleep(5)
+        render_html(f"{config.name.lower()}_load_test_{timestamp}", results_dir)
     
     print(f"\n🎉 All Locust tests completed!")
-    print(f"📁 Results saved in: locust_results/")
-    print(f"📊 Open HTML files in your browser to view detailed results")
+    print(f"📁 Results saved in: {results_dir}/")
+    print("📊 Open the HTML files in your browser for summary tables of stats, failures and exceptions")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file